@@ -1,15 +1,26 @@
 import logging
-logging.basicConfig(level=logging.DEBUG)
+import os
+logging.basicConfig(level=os.environ.get('LOG_LEVEL', 'INFO').upper())
 
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, Response, request, jsonify, send_from_directory, stream_with_context
 from flask_cors import CORS
+from flask_compress import Compress
 from vrp_solver import VRPSolver
 import random
-import os
 import math
 import json
 import csv
+import functools
+import time
+import threading
+import sqlite3
+from contextlib import closing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
 
 # Get the absolute path to the frontend directory
 frontend_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'frontend')
@@ -19,6 +30,72 @@ backend_dir = os.path.dirname(__file__)
 app = Flask(__name__)
 CORS(app)  # Enable CORS for all routes
 
+# Compress larger responses, preferring Brotli when the client supports it.
+# Compress's own hook is disabled so streamed solutions can bypass it (see below).
+app.config["COMPRESS_MIN_SIZE"] = 1024
+app.config["COMPRESS_ALGORITHM"] = ["br", "gzip"]
+app.config["COMPRESS_REGISTER"] = False
+compress = Compress(app)
+
+def json_response(payload, status=200):
+    """Serialize payload with orjson (which also handles NumPy values) into a JSON response."""
+    return Response(orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY),
+                    status=status, mimetype='application/json')
+
+class StreamingJSONResponse(Response):
+    """JSON sent to the client while it is being encoded; never buffered for compression."""
+    default_mimetype = 'application/json'
+
+@app.after_request
+def compress_response(response):
+    # flask-compress 1.10 has no COMPRESS_STREAMS check and would drain the whole
+    # generator via get_data() before sending, defeating the streaming
+    if isinstance(response, StreamingJSONResponse):
+        return response
+    return compress.after_request(response)
+
+# Solutions with at least this many route entries are streamed instead of encoded in one shot.
+# Future-proofing: the single vehicle's 10 km Distance capacity keeps current routes far shorter.
+STREAM_MIN_ROUTE_LENGTH = 2000
+STREAM_CHUNK_SIZE = 64 * 1024  # Bytes buffered per chunk written to the client
+
+def _iter_json(payload):
+    """Encode a dict as JSON, yielding chunks of about STREAM_CHUNK_SIZE bytes."""
+    parts = []
+    size = 0
+    
+    def emit(fragment):
+        nonlocal size
+        parts.append(fragment)
+        size += len(fragment)
+    
+    emit(b'{')
+    for n, (key, value) in enumerate(payload.items()):
+        if n:
+            emit(b',')
+        emit(orjson.dumps(key) + b':')
+        if isinstance(value, list):
+            emit(b'[')
+            for i, entry in enumerate(value):
+                if i:
+                    emit(b',')
+                emit(orjson.dumps(entry, option=orjson.OPT_SERIALIZE_NUMPY))
+                if size >= STREAM_CHUNK_SIZE:
+                    yield b''.join(parts)
+                    parts.clear()
+                    size = 0
+            emit(b']')
+        else:
+            emit(orjson.dumps(value, option=orjson.OPT_SERIALIZE_NUMPY))
+    emit(b'}')
+    yield b''.join(parts)
+
+def solution_response(solution):
+    """JSON response for a solver result, streamed when the route is large."""
+    if len(solution.get('route', ())) < STREAM_MIN_ROUTE_LENGTH:
+        return json_response(solution)
+    return StreamingJSONResponse(stream_with_context(_iter_json(solution)))
+
 # Serve the frontend files
 @app.route('/', defaults={'path': ''})
 @app.route('/<path:path>')
@@ -30,6 +107,34 @@ def serve_frontend(path):
     except:
         return send_from_directory(frontend_dir, 'index.html')
 
+# Worker processes that run OR-Tools so solves don't block Flask request threads
+SOLVE_TIMEOUT = 10  # Seconds to wait for a solve before failing the request
+# Solver processes per server process; keep (WSGI workers x SOLVE_WORKERS) near the CPU count
+SOLVE_WORKERS = int(os.environ.get('SOLVE_WORKERS', 2))
+_SOLVE_POOL = ProcessPoolExecutor(max_workers=SOLVE_WORKERS)
+_solve_pool_lock = threading.Lock()
+
+def _replace_broken_solve_pool(broken_pool):
+    """Swap in a fresh pool after a worker died; other threads may race to do the same."""
+    global _SOLVE_POOL
+    with _solve_pool_lock:
+        if _SOLVE_POOL is broken_pool:
+            _SOLVE_POOL = ProcessPoolExecutor(max_workers=SOLVE_WORKERS)
+    broken_pool.shutdown(wait=False)
+
+def _solve_task(driver_location, passengers):
+    """Build and solve a VRP in a worker process. Only the plain result dict crosses back."""
+    # Create and setup solver
+    solver = VRPSolver()
+    solver.add_driver_location(driver_location)
+    
+    # Add all passengers
+    for passenger in passengers:
+        solver.add_passenger(passenger['pickup'], passenger['dropoff'])
+    
+    # Solve the VRP
+    return solver.solve()
+
 # Your existing API routes
 @app.route('/api/solve', methods=['POST'])
 def solve_vrp():
@@ -40,107 +145,280 @@ def solve_vrp():
         driver_location = data.get('driver', [0, 0])
         passengers = data.get('passengers', [])
         
-        # Create and setup solver
-        solver = VRPSolver()
-        solver.add_driver_location(driver_location)
-        
-        # Add all passengers
-        for passenger in passengers:
-            solver.add_passenger(passenger['pickup'], passenger['dropoff'])
-        
-        # Solve the VRP
-        solution = solver.solve()
+        pool = _SOLVE_POOL
+        try:
+            future = pool.submit(_solve_task, driver_location, passengers)
+            solution = future.result(timeout=SOLVE_TIMEOUT)
+        except BrokenProcessPool:
+            # A worker crashed or was killed; rebuild so later requests still work
+            _replace_broken_solve_pool(pool)
+            app.logger.error("Solver process died, solve pool restarted")
+            return jsonify({"error": "Solver process crashed"}), 500
+        except FutureTimeoutError:
+            # Drop the task if it is still queued; a running solve ends at its own time limit
+            future.cancel()
+            app.logger.error("Solve timed out after %d seconds", SOLVE_TIMEOUT)
+            return jsonify({"error": f"Solver timed out after {SOLVE_TIMEOUT} seconds"}), 504
         
         if solution:
-            return jsonify(solution)
+            return solution_response(solution)
         else:
             return jsonify({"error": "No solution found"}), 400
     except Exception as e:
-        print(f"Error in solve_vrp: {str(e)}")
+        app.logger.error("Error in solve_vrp: %s", e)
         return jsonify({"error": f"Server error: {str(e)}"}), 500
 
+# For the driver location, we'll use a fixed point in Noida/Delhi
+DRIVER_LAT = 28.5355
+DRIVER_LNG = 77.3910
+
+def address_to_coords(address):
+    """Simple hash function to generate predictable coordinates from address string."""
+    if not address:
+        return [DRIVER_LNG, DRIVER_LAT]  # Default to driver location if no address
+    
+    # Summing the UTF-8 bytes runs in C and matches the per-character sum for ASCII
+    hash_val = sum(address.encode('utf-8'))
+    lat_offset = (hash_val % 100) / 1000.0
+    lng_offset = ((hash_val // 100) % 100) / 1000.0
+    return [DRIVER_LNG + lng_offset, DRIVER_LAT + lat_offset]
+
+# Column order of the users CSV
+USER_FIELDS = ('id', 'name', 'email', 'phone', 'pickup_address', 'dropoff_address')
+# Coordinate columns derived from the addresses at load time
+COORD_FIELDS = {'pickup': 'pickup_address', 'dropoff': 'dropoff_address'}
+
 def load_users_from_csv():
-    """Load users from the CSV file with their addresses."""
-    users = []
+    """Load users from the CSV file with their addresses.
+    
+    Users are stored column-wise as a dict of field name -> list of values;
+    use user_count() and get_user() to access them. The parsed columns are
+    memoized and only re-read when the file's modification time changes.
+    """
     csv_path = os.path.join(backend_dir, 'C2Admin.users131.csv')
+    try:
+        mtime = os.path.getmtime(csv_path)
+    except OSError:
+        mtime = None
+    return _load_users_cached(csv_path, mtime)
+
+def user_count(users):
+    """Number of users in a column store returned by load_users_from_csv()."""
+    return len(users['id'])
+
+def get_user(users, i):
+    """Materialize the i-th user of a column store as a dict."""
+    user = {field: users[field][i] for field in USER_FIELDS}
+    for field in COORD_FIELDS:
+        user[field] = users[field][i]
+    return user
+
+@functools.lru_cache(maxsize=1)
+def _load_users_cached(csv_path, mtime):
+    """Parse the users CSV into parallel column lists."""
+    users = {field: [] for field in USER_FIELDS}
     
-    print(f"Loading CSV from: {csv_path}")
-    print(f"File exists: {os.path.exists(csv_path)}")
+    app.logger.debug("Loading CSV from: %s", csv_path)
+    app.logger.debug("File exists: %s", mtime is not None)
     
     try:
-        with open(csv_path, 'r', encoding='utf-8') as f:
-            csv_reader = csv.reader(f)
-            # Skip header row if present
-            header = next(csv_reader, None)
-            if header and 'name' in str(header).lower():
-                print("Skipped header row")
-            else:
-                # If not a header, process as a data row
-                if header and len(header) >= 6:
-                    user = {
-                        'id': header[0],
-                        'name': header[1],
-                        'email': header[2],
-                        'phone': header[3],
-                        'pickup_address': header[4],
-                        'dropoff_address': header[5],
-                    }
-                    if user['pickup_address'] and user['dropoff_address']:
-                        users.append(user)
-            
-            # Process remaining rows
+        with open(csv_path, 'r', encoding='utf-8', newline='', buffering=1 << 20) as f:
+            csv_reader = csv.DictReader(f, fieldnames=USER_FIELDS)
+            next(csv_reader, None)  # Skip header row
             for row in csv_reader:
-                if len(row) >= 6:  # Ensure we have enough columns
-                    user = {
-                        'id': row[0],
-                        'name': row[1],
-                        'email': row[2],
-                        'phone': row[3],
-                        'pickup_address': row[4],
-                        'dropoff_address': row[5],
-                    }
-                    # Only add users with valid addresses
-                    if user['pickup_address'] and user['dropoff_address']:
-                        users.append(user)
-                        
-        print(f"Successfully loaded {len(users)} users from CSV")
+                # Only keep users with valid addresses (missing columns read as None)
+                if row['pickup_address'] and row['dropoff_address']:
+                    for field in USER_FIELDS:
+                        users[field].append(row[field])
+        
+        app.logger.debug("Successfully loaded %d users from CSV", user_count(users))
         
     except Exception as e:
-        print(f"Error loading CSV: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        app.logger.exception("Error loading CSV: %s", e)
     
     # Fallback data if no users were loaded
-    if not users:
-        print("No users found, using fallback data")
-        users = [
-            {
-                'id': '1',
-                'name': 'Test User 1',
-                'email': 'test1@example.com',
-                'phone': '1234567890',
-                'pickup_address': 'Noida Sector 62',
-                'dropoff_address': 'Delhi Connaught Place'
-            },
-            {
-                'id': '2',
-                'name': 'Test User 2',
-                'email': 'test2@example.com',
-                'phone': '0987654321',
-                'pickup_address': 'Noida Sector 18',
-                'dropoff_address': 'Gurgaon Cyber City'
-            }
-        ]
+    if not user_count(users):
+        app.logger.debug("No users found, using fallback data")
+        users = {
+            'id': ['1', '2'],
+            'name': ['Test User 1', 'Test User 2'],
+            'email': ['test1@example.com', 'test2@example.com'],
+            'phone': ['1234567890', '0987654321'],
+            'pickup_address': ['Noida Sector 62', 'Noida Sector 18'],
+            'dropoff_address': ['Delhi Connaught Place', 'Gurgaon Cyber City'],
+        }
+    
+    # Hash addresses to coordinates once here so requests only sample users
+    for field, address_field in COORD_FIELDS.items():
+        users[field] = [address_to_coords(address) for address in users[address_field]]
     
     return users
 
+# Persistent geocoding cache: normalized address -> [lon, lat].
+# SQLite lets several server processes add entries safely, one row per new address;
+# the same database holds the Nominatim rate limit shared by those processes.
+GEOCODE_CACHE_PATH = os.path.join(backend_dir, 'geocode_cache.sqlite3')
+GEOCODE_NEGATIVE_TTL = 300  # Seconds before a failed lookup is retried
+_geocode_lock = threading.Lock()
+_geocode_misses = {}  # normalized address -> time the failed lookup expires
+
+def _geocode_db():
+    """Open the geocoding cache database, creating its table if needed."""
+    conn = sqlite3.connect(GEOCODE_CACHE_PATH, timeout=10)
+    conn.execute("CREATE TABLE IF NOT EXISTS geocode "
+                 "(address TEXT PRIMARY KEY, lon REAL NOT NULL, lat REAL NOT NULL)")
+    conn.execute("CREATE TABLE IF NOT EXISTS rate_limit "
+                 "(name TEXT PRIMARY KEY, next_slot REAL NOT NULL)")
+    return conn
+
+def _load_geocode_cache():
+    """Load previously geocoded addresses from disk."""
+    try:
+        with closing(_geocode_db()) as conn:
+            return {address: [lon, lat] for address, lon, lat
+                    in conn.execute("SELECT address, lon, lat FROM geocode")}
+    except sqlite3.Error as e:
+        app.logger.warning("Could not load geocode cache: %s", e)
+        return {}
+
+_GEOCODE_CACHE = None  # Loaded from disk on first use
+
+def _geocode_cache():
+    """Return the in-memory geocoding cache, loading it from disk on first use."""
+    global _GEOCODE_CACHE
+    if _GEOCODE_CACHE is None:
+        with _geocode_lock:
+            if _GEOCODE_CACHE is None:
+                _GEOCODE_CACHE = _load_geocode_cache()
+    return _GEOCODE_CACHE
+
+def _read_geocode_entry(key):
+    """Look up an address another process may have cached since startup."""
+    try:
+        with closing(_geocode_db()) as conn:
+            row = conn.execute("SELECT lon, lat FROM geocode WHERE address = ?", (key,)).fetchone()
+    except sqlite3.Error as e:
+        app.logger.warning("Could not read geocode cache: %s", e)
+        return None
+    return list(row) if row else None
+
+def _save_geocode_entry(key, coords):
+    """Persist one geocoded address."""
+    try:
+        with closing(_geocode_db()) as conn, conn:
+            conn.execute("INSERT OR REPLACE INTO geocode (address, lon, lat) VALUES (?, ?, ?)",
+                         (key, coords[0], coords[1]))
+    except sqlite3.Error as e:
+        app.logger.warning("Could not save geocode cache: %s", e)
+
+def _normalize_address(address):
+    return " ".join(address.lower().split())
+
 def geocode_address(address):
-    """Convert address to coordinates using a geocoding service."""
+    """Convert address to coordinates using a geocoding service.
+    
+    Results are cached on disk so repeated addresses never hit the network;
+    failed lookups are remembered for GEOCODE_NEGATIVE_TTL seconds.
+    """
+    key = _normalize_address(address)
+    cache = _geocode_cache()
+    
+    coords = cache.get(key)
+    if coords is not None:
+        return coords
+    with _geocode_lock:
+        retry_at = _geocode_misses.get(key)
+        if retry_at is not None:
+            if retry_at > time.time():
+                return None
+            del _geocode_misses[key]  # Expired; forget it so the dict can't grow unbounded
+    
+    coords = _read_geocode_entry(key)
+    if coords is not None:
+        with _geocode_lock:
+            cache[key] = coords
+        return coords
+    
+    coords = _fetch_coordinates(address)
+    
+    if coords is None:
+        with _geocode_lock:
+            _geocode_misses[key] = time.time() + GEOCODE_NEGATIVE_TTL
+    else:
+        with _geocode_lock:
+            _geocode_misses.pop(key, None)
+            cache[key] = coords
+        _save_geocode_entry(key, coords)
+    
+    return coords
+
+def geocode_many(addresses, max_workers=4):
+    """Geocode several addresses, returning a list of [lon, lat] or None in input order.
+    
+    Cached addresses are answered immediately; the rest are fetched
+    concurrently over the shared keep-alive session.
+    """
+    cache = _geocode_cache()
+    results = [None] * len(addresses)
+    pending = {}  # normalized address -> (original address, positions)
+    for i, address in enumerate(addresses):
+        key = _normalize_address(address)
+        coords = cache.get(key)
+        if coords is not None:
+            results[i] = coords
+        else:
+            pending.setdefault(key, (address, []))[1].append(i)
+    
+    if pending:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(geocode_address, address): positions
+                       for address, positions in pending.values()}
+            for future, positions in futures.items():
+                coords = future.result()
+                for i in positions:
+                    results[i] = coords
+    
+    return results
+
+# Shared HTTP session so geocoding requests reuse pooled keep-alive connections
+NOMINATIM_URL = "https://nominatim.openstreetmap.org/search"
+NOMINATIM_MIN_INTERVAL = 1.0  # Nominatim usage policy: at most 1 request per second
+NOMINATIM_TIMEOUT = (3.05, 10)  # (connect, read) seconds, so a stalled connection can't hang a worker
+_SESSION = requests.Session()
+_SESSION.mount('https://', HTTPAdapter(pool_connections=16, pool_maxsize=16))
+_SESSION.headers.update({"User-Agent": "RouteOptimizer/1.0", "Accept-Encoding": "gzip"})
+
+def _wait_for_nominatim_slot():
+    """Block until the next request may be sent without exceeding the rate limit.
+    
+    The next free send time lives in the geocoding cache database, so the limit
+    holds across all server processes, not just threads of this one.
+    """
+    with closing(_geocode_db()) as conn:
+        conn.isolation_level = None  # Manage the transaction explicitly
+        conn.execute("BEGIN IMMEDIATE")  # Take the write lock before reading the slot
+        try:
+            row = conn.execute("SELECT next_slot FROM rate_limit WHERE name = 'nominatim'").fetchone()
+            now = time.time()
+            next_slot = row[0] if row else 0.0
+            conn.execute("INSERT OR REPLACE INTO rate_limit (name, next_slot) VALUES ('nominatim', ?)",
+                         (max(now, next_slot) + NOMINATIM_MIN_INTERVAL,))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+    wait = next_slot - now
+    if wait > 0:
+        time.sleep(wait)
+
+def _fetch_coordinates(address):
+    """Query Nominatim for an address, returning [lon, lat] or None."""
     try:
         # Using Nominatim (OpenStreetMap) for demonstration
         # In production, use a paid service like Google Maps API
-        url = f"https://nominatim.openstreetmap.org/search?q={address}&format=json&limit=1"
-        response = requests.get(url, headers={"User-Agent": "RouteOptimizer/1.0"})
+        _wait_for_nominatim_slot()
+        response = _SESSION.get(NOMINATIM_URL, params={"q": address, "format": "json", "limit": 1},
+                                timeout=NOMINATIM_TIMEOUT)
         data = response.json()
         
         if data and len(data) > 0:
@@ -149,7 +427,7 @@ def geocode_address(address):
             return [lon, lat]  # Our app uses [lon, lat] format
         
     except Exception as e:
-        print(f"Geocoding error: {e}")
+        app.logger.warning("Geocoding error: %s", e)
     
     return None
 
@@ -158,53 +436,41 @@ def generate_problem_from_real_data():
     """Generate a VRP problem using real user data from CSV."""
     users = load_users_from_csv()
     
+    num_available = user_count(users)
+    
     # Select a random subset of users (3-5 passengers)
-    if len(users) > 5:
+    if num_available > 5:
         num_users = random.randint(3, 5)
-        selected_users = random.sample(users, num_users)
+        selected = random.sample(range(num_available), num_users)
     else:
-        selected_users = users[:min(5, len(users))]
+        selected = range(num_available)
+    selected_users = [get_user(users, i) for i in selected]
     
-    # For the driver location, we'll use a fixed point in Noida/Delhi
-    driver_lat = 28.5355
-    driver_lng = 77.3910
-    driver = [driver_lng, driver_lat]
+    driver = [DRIVER_LNG, DRIVER_LAT]
     
     passengers = []
     for user in selected_users:
-        # Simple hash function to generate predictable coordinates from address string
-        def address_to_coords(address):
-            if not address:
-                return [driver_lng, driver_lat]  # Default to driver location if no address
-                
-            hash_val = sum(ord(c) for c in address)
-            lat_offset = (hash_val % 100) / 1000.0
-            lng_offset = ((hash_val // 100) % 100) / 1000.0
-            return [driver_lng + lng_offset, driver_lat + lat_offset]
-        
-        pickup_coords = address_to_coords(user['pickup_address'])
-        dropoff_coords = address_to_coords(user['dropoff_address'])
-        
         passengers.append({
             "id": user['id'],
             "name": user['name'],
-            "pickup": pickup_coords,
+            "pickup": user['pickup'],
             "pickup_address": user['pickup_address'],
-            "dropoff": dropoff_coords,
+            "dropoff": user['dropoff'],
             "dropoff_address": user['dropoff_address']
         })
     
     # Debug output
-    print(f"Generated problem with {len(passengers)} passengers")
+    app.logger.debug("Generated problem with %d passengers", len(passengers))
     if passengers:
-        print(f"First passenger: {passengers[0]['name']} - Pickup: {passengers[0]['pickup']}, Dropoff: {passengers[0]['dropoff']}")
+        app.logger.debug("First passenger: %s - Pickup: %s, Dropoff: %s",
+                         passengers[0]['name'], passengers[0]['pickup'], passengers[0]['dropoff'])
     
     result = {
         "driver": driver,
         "passengers": passengers
     }
     
-    return jsonify(result)
+    return json_response(result)
 
 @app.route('/api/users', methods=['GET'])
 def get_users():
@@ -215,7 +481,7 @@ def get_users():
         if os.path.exists(json_file_path):
             with open(json_file_path, 'r') as file:
                 users = json.load(file)
-                return jsonify(users)
+                return json_response(users)
         
         # If JSON doesn't exist, try CSV
         csv_file_path = os.path.join(backend_dir, 'C2Admin.users131.csv')
@@ -225,11 +491,11 @@ def get_users():
                 csv_reader = csv.DictReader(file)
                 for row in csv_reader:
                     users.append(row)
-            return jsonify(users)
+            return json_response(users)
         
         return jsonify({"error": "User data files not found"}), 404
     except Exception as e:
-        print(f"Error reading user data: {str(e)}")
+        app.logger.error("Error reading user data: %s", e)
         return jsonify({"error": f"Server error: {str(e)}"}), 500
 
 @app.route('/api/create-route', methods=['POST'])
@@ -267,14 +533,16 @@ def create_route_from_users():
                 "dropoff": dropoff
             })
         
-        return jsonify({
+        return json_response({
             "driver": driver,
             "passengers": passengers
         })
         
     except Exception as e:
-        print(f"Error creating route: {str(e)}")
+        app.logger.error("Error creating route: %s", e)
         return jsonify({"error": f"Server error: {str(e)}"}), 500
 
+# Development server only. In production run under a WSGI server, e.g.:
+#   SOLVE_WORKERS=2 gunicorn -w 4 -k gthread --threads 8 app:app
 if __name__ == '__main__':
-    app.run(debug=True)
\ No newline at end of file
+    app.run(debug=os.environ.get('FLASK_DEBUG') == '1')
\ No newline at end of file
@@ -1,12 +1,17 @@
 from ortools.constraint_solver import routing_enums_pb2
 from ortools.constraint_solver import pywrapcp
 import numpy as np
+import math
+
+EARTH_RADIUS_M = 6371000  # Mean Earth radius in meters
+SMALL_PROBLEM_SIZE = 12  # Up to this many locations, a short search is enough
 
 class VRPSolver:
     def __init__(self):
         self.locations = []
         self.distance_matrix = None
         self.pickups_deliveries = []
+        self._type_by_index = None
         
     def add_driver_location(self, location):
         """Add the driver's starting location."""
@@ -22,25 +27,42 @@ class VRPSolver:
         
         # Add this pickup-delivery pair
         self.pickups_deliveries.append((pickup_index, dropoff_index))
+        self._type_by_index = None  # Invalidate location type lookup
     
     def _calculate_distance(self, point1, point2):
-        """Calculate distance between two points."""
-        lon1, lat1 = point1
-        lon2, lat2 = point2
-        # Simple scaling for testing purposes
-        return ((lon2 - lon1)**2 + (lat2 - lat1)**2)**0.5 * 111000  # Rough conversion to meters
+        """Calculate great-circle (Haversine) distance in meters between two [lon, lat] points."""
+        lon1, lat1 = map(math.radians, point1)
+        lon2, lat2 = map(math.radians, point2)
+        a = (math.sin((lat2 - lat1) / 2)**2 +
+             math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2)**2)
+        return 2 * EARTH_RADIUS_M * math.asin(math.sqrt(a))
     
     def _compute_distance_matrix(self):
-        """Compute distance matrix between all locations."""
-        num_locations = len(self.locations)
-        self.distance_matrix = np.zeros((num_locations, num_locations))
-        
-        for i in range(num_locations):
-            for j in range(num_locations):
-                if i != j:
-                    self.distance_matrix[i][j] = self._calculate_distance(self.locations[i], self.locations[j])
-        
-        return self.distance_matrix.astype(int).tolist()
+        """Compute Haversine distance matrix (integer meters) between all locations."""
+        pts_rad = np.deg2rad(np.asarray(self.locations, dtype=np.float64))
+        lon = pts_rad[:, 0]
+        lat = pts_rad[:, 1]
+        cos_lat = np.cos(lat)  # Computed once, reused for every pair
+        
+        # The metric is symmetric, so only evaluate pairs above the diagonal
+        num_locations = len(pts_rad)
+        upper = np.triu_indices(num_locations, k=1)
+        i, j = upper
+        a = np.sin((lat[i] - lat[j]) / 2)**2 + cos_lat[i] * cos_lat[j] * np.sin((lon[i] - lon[j]) / 2)**2
+        # Finish in place on a (clip guards against rounding pushing it above 1),
+        # then truncate once to integer meters
+        np.clip(a, 0.0, 1.0, out=a)
+        np.sqrt(a, out=a)
+        np.arcsin(a, out=a)
+        a *= 2 * EARTH_RADIUS_M
+        upper_distances = a.astype(np.int64)
+        
+        # Mirror into a full matrix; the diagonal stays zero
+        self.distance_matrix = np.zeros((num_locations, num_locations), dtype=np.int64)
+        self.distance_matrix[upper] = upper_distances
+        self.distance_matrix.T[upper] = upper_distances
+        
+        return self.distance_matrix
     
     def solve(self):
         """Solve the VRP problem."""
@@ -49,18 +71,15 @@ class VRPSolver:
             raise ValueError(f"Need driver location and 4 passengers with pickup/dropoff locations. Got {len(self.locations)} locations.")
             
         distance_matrix = self._compute_distance_matrix()
+        self._build_location_types()
         
         # Create the routing model
-        manager = pywrapcp.RoutingIndexManager(len(distance_matrix), 1, 0)
+        manager = pywrapcp.RoutingIndexManager(len(self.locations), 1, 0)
         routing = pywrapcp.RoutingModel(manager)
         
-        # Define distance callback
-        def distance_callback(from_index, to_index):
-            from_node = manager.IndexToNode(from_index)
-            to_node = manager.IndexToNode(to_index)
-            return distance_matrix[from_node][to_node]
-        
-        transit_callback_index = routing.RegisterTransitCallback(distance_callback)
+        # Register the distance matrix directly so lookups stay in C++
+        # (the SWIG binding only accepts nested Python lists)
+        transit_callback_index = routing.RegisterTransitMatrix(distance_matrix.tolist())
         routing.SetArcCostEvaluatorOfAllVehicles(transit_callback_index)
         
         # Add a dimension for distance/time
@@ -74,17 +93,22 @@ class VRPSolver:
         
         distance_dimension = routing.GetDimensionOrDie("Distance")
         
+        # Convert each pickup-delivery pair to routing indices once
+        pickup_delivery_indices = [
+            (manager.NodeToIndex(pickup), manager.NodeToIndex(delivery))
+            for pickup, delivery in self.pickups_deliveries
+        ]
+        
         # Add pickup and delivery constraints
-        for pickup, delivery in self.pickups_deliveries:
-            routing.AddPickupAndDelivery(pickup, delivery)
-            routing.solver().Add(
-                routing.VehicleVar(manager.NodeToIndex(pickup)) == 
-                routing.VehicleVar(manager.NodeToIndex(delivery))
+        solver = routing.solver()
+        for pickup_index, delivery_index in pickup_delivery_indices:
+            routing.AddPickupAndDelivery(pickup_index, delivery_index)
+            solver.Add(
+                routing.VehicleVar(pickup_index) == 
+                routing.VehicleVar(delivery_index)
             )
             # Pickup must happen before delivery - FIXED THIS PART
-            pickup_index = manager.NodeToIndex(pickup)
-            delivery_index = manager.NodeToIndex(delivery)
-            routing.solver().Add(
+            solver.Add(
                 distance_dimension.CumulVar(pickup_index) <= 
                 distance_dimension.CumulVar(delivery_index)
             )
@@ -97,10 +121,19 @@ class VRPSolver:
         search_parameters.local_search_metaheuristic = (
             routing_enums_pb2.LocalSearchMetaheuristic.GUIDED_LOCAL_SEARCH
         )
-        search_parameters.time_limit.FromSeconds(5)  # 5 second time limit
-        
-        # Solve the problem
-        solution = routing.SolveWithParameters(search_parameters)
+        if len(self.locations) <= SMALL_PROBLEM_SIZE:
+            search_parameters.time_limit.FromSeconds(1)  # Small instances converge well within 1 second
+        else:
+            search_parameters.time_limit.FromSeconds(5)  # 5 second time limit
+        search_parameters.log_search = False
+        
+        # Solve the problem, warm-started from a nearest-neighbor route when it is feasible
+        initial_route = [manager.NodeToIndex(node) for node in self._nearest_neighbor_route()]
+        initial_solution = routing.ReadAssignmentFromRoutes([initial_route], True)
+        if initial_solution:
+            solution = routing.SolveFromAssignmentWithParameters(initial_solution, search_parameters)
+        else:
+            solution = routing.SolveWithParameters(search_parameters)
         
         if not solution:
             return None
@@ -131,15 +164,36 @@ class VRPSolver:
                          for i, loc in enumerate(self.locations)]
         }
     
+    def _nearest_neighbor_route(self):
+        """Build a greedy route (excluding the depot) that visits each pickup before its dropoff."""
+        num_locations = len(self.locations)
+        delivery_for = dict(self.pickups_deliveries)
+        
+        # Only pickups are reachable at first; a dropoff unlocks once its pickup is visited
+        available = np.zeros(num_locations, dtype=bool)
+        available[list(delivery_for)] = True
+        unreachable = np.iinfo(np.int64).max
+        
+        route = []
+        current = 0
+        while available.any():
+            current = int(np.argmin(np.where(available, self.distance_matrix[current], unreachable)))
+            available[current] = False
+            if current in delivery_for:
+                available[delivery_for[current]] = True
+            route.append(current)
+        
+        return route
+    
+    def _build_location_types(self):
+        """Build the index -> location type lookup table."""
+        self._type_by_index = {0: "driver"}
+        for pickup, delivery in self.pickups_deliveries:
+            self._type_by_index[pickup] = "pickup"
+            self._type_by_index[delivery] = "dropoff"
+    
     def _get_location_type(self, index):
         """Determine the type of a location by its index."""
-        if index == 0:
-            return "driver"
-            
-        for pickup, delivery in self.pickups_deliveries:
-            if index == pickup:
-                return "pickup"
-            if index == delivery:
-                return "dropoff"
-                
-        return "unknown"
\ No newline at end of file
+        if self._type_by_index is None:
+            self._build_location_types()
+        return self._type_by_index.get(index, "unknown")